@@ -3,89 +3,182 @@ Feature processing and vector generation
 """
 
 import logging
+import math
+from types import MappingProxyType
 from typing import Dict, Any, List
 import numpy as np
+from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 
+try:
+    from numba import njit, prange
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
 logger = logging.getLogger(__name__)
 
 
+def _normalize_batch_numpy(matrix: np.ndarray, offsets: np.ndarray,
+                           inv_scales: np.ndarray) -> np.ndarray:
+    """NumPy fallback for batch normalization when numba is unavailable"""
+    normalized = (matrix - offsets) * inv_scales
+
+    np.clip(normalized, 0, 1, out=normalized)
+
+    # Row norms in one einsum kernel: no squared intermediate matrix
+    norms = np.sqrt(np.einsum('ij,ij->i', normalized, normalized))
+    np.divide(normalized, norms[:, None], out=normalized, where=norms[:, None] > 0)
+
+    return normalized
+
+
+if _HAVE_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _normalize_batch(matrix, offsets, inv_scales):
+        """Fused affine rescale + clip + L2 normalization over (N, D) rows"""
+        n, d = matrix.shape
+        out = np.empty_like(matrix)
+
+        for i in prange(n):
+            sq_sum = 0.0
+            for j in range(d):
+                value = (matrix[i, j] - offsets[j]) * inv_scales[j]
+                if value < 0:
+                    value = 0.0
+                elif value > 1:
+                    value = 1.0
+                out[i, j] = value
+                sq_sum += value * value
+
+            if sq_sum > 0:
+                inv_norm = 1.0 / np.sqrt(sq_sum)
+                for j in range(d):
+                    out[i, j] *= inv_norm
+
+        return out
+
+    # Warm up the JIT at import so the first real call doesn't pay compile cost
+    _normalize_batch(np.zeros((1, 16), dtype=np.float32),
+                     np.zeros(16, dtype=np.float32),
+                     np.ones(16, dtype=np.float32))
+else:
+    _normalize_batch = _normalize_batch_numpy
+
+
 class FeatureProcessor:
     """Process extracted features into normalized vectors"""
     
+    # Feature specification: name -> (vector index, affine offset,
+    # inverse scale). Tempo maps through (x - 60) / 140 (typical 60-200
+    # BPM range); everything else is already on a [0, 1] scale. One
+    # frozen table drives the vector layout, the O(1) name lookups, and
+    # the normalization arrays.
+    _FEATURE_SPEC = MappingProxyType({
+        'tempo': (0, 60.0, 1.0 / 140.0),
+        'energy': (1, 0.0, 1.0),
+        'danceability': (2, 0.0, 1.0),
+        'valence': (3, 0.0, 1.0),
+        'acousticness': (4, 0.0, 1.0),
+        'instrumentalness': (5, 0.0, 1.0),
+        'speechiness': (6, 0.0, 1.0),
+        'loudness': (7, 0.0, 1.0),
+        'spectral_centroid': (8, 0.0, 1.0),
+        'spectral_rolloff': (9, 0.0, 1.0),
+        'zero_crossing_rate': (10, 0.0, 1.0),
+        'dynamic_complexity': (11, 0.0, 1.0),
+        'beats_confidence': (12, 0.0, 1.0),
+        'onset_rate': (13, 0.0, 1.0),
+        'key_strength': (14, 0.0, 1.0),
+        'dissonance': (15, 0.0, 1.0),
+    })
+
     def __init__(self):
         self.scaler = StandardScaler()
-        self.feature_order = [
-            'tempo', 'energy', 'danceability', 'valence', 'acousticness',
-            'instrumentalness', 'speechiness', 'loudness', 'spectral_centroid',
-            'spectral_rolloff', 'zero_crossing_rate', 'dynamic_complexity',
-            'beats_confidence', 'onset_rate', 'key_strength', 'dissonance'
-        ]
+        self._spec = self._FEATURE_SPEC
+        # Vector layout and normalization tables derived from the spec
+        self.feature_order = list(self._spec)
+        self._order_tuple = tuple(self._spec)
+        self._norm_offsets = np.array(
+            [offset for _, offset, _ in self._spec.values()], dtype=np.float32
+        )
+        self._norm_inv_scales = np.array(
+            [inv_scale for _, _, inv_scale in self._spec.values()], dtype=np.float32
+        )
+        # PCA fitted on first use and reused for subsequent transforms
+        self._pca = None
     
-    def create_feature_vector(self, features: Dict[str, Any]) -> np.ndarray:
+    def create_feature_vector(self, features: Dict[str, Any],
+                              out: np.ndarray = None) -> np.ndarray:
         """
         Create normalized feature vector from extracted features
-        
+
         Args:
             features: Dictionary of extracted features
-            
+            out: Optional preallocated float32 buffer to fill and return;
+                repeated callers reuse one allocation instead of paying
+                one per vector
+
         Returns:
             Normalized feature vector
         """
-        # Extract numeric features in consistent order
-        vector_values = []
-        
-        for feature_name in self.feature_order:
-            if feature_name in features:
-                value = features[feature_name]
-                
-                # Handle different value types
-                if isinstance(value, (int, float)):
-                    vector_values.append(float(value))
-                elif isinstance(value, str) and value.replace('.', '').isdigit():
-                    vector_values.append(float(value))
-                else:
-                    # Use default value for missing/invalid features
-                    vector_values.append(0.0)
-            else:
-                vector_values.append(0.0)
-        
-        # Convert to numpy array
-        vector = np.array(vector_values, dtype=np.float32)
-        
-        # Normalize
-        vector = self._normalize_vector(vector)
-        
-        return vector
-    
-    def _normalize_vector(self, vector: np.ndarray) -> np.ndarray:
-        """Normalize feature vector"""
-        # Handle specific feature ranges
-        normalized = vector.copy()
-        
-        # Tempo: typically 60-200 BPM
-        if len(normalized) > 0:
-            normalized[0] = (normalized[0] - 60) / 140 if normalized[0] > 0 else 0
-        
-        # Most features are already 0-1, but ensure bounds
-        normalized = np.clip(normalized, 0, 1)
-        
-        # L2 normalization for similarity search
-        norm = np.linalg.norm(normalized)
+        vector = self._gather_values(features, out)
+
+        # Normalize in place on the gathered buffer
+        return self._normalize_vector(vector, out=vector)
+
+    def _gather_values(self, features: Dict[str, Any],
+                       out: np.ndarray = None) -> np.ndarray:
+        """Extract numeric features in consistent order as a raw vector"""
+        if out is None:
+            out = np.empty(len(self._order_tuple), dtype=np.float32)
+
+        for i, feature_name in enumerate(self._order_tuple):
+            value = features.get(feature_name, 0.0)
+            # Non-numeric values (key, scale, chords) fall back to 0
+            out[i] = value if isinstance(value, (int, float)) else 0.0
+
+        return out
+
+    def _normalize_vector(self, vector: np.ndarray,
+                          out: np.ndarray = None) -> np.ndarray:
+        """Normalize feature vector (affine rescale, clip to [0, 1], L2)
+
+        With out=vector the whole pipeline runs in place on the caller's
+        buffer; by default the input is left untouched.
+        """
+        if out is None:
+            normalized = np.array(vector, dtype=np.float32)
+        else:
+            normalized = out
+            if normalized is not vector:
+                np.copyto(normalized, vector)
+        d = normalized.shape[0]
+
+        # Fully in-place affine: no intermediate array per call
+        np.subtract(normalized, self._norm_offsets[:d], out=normalized)
+        np.multiply(normalized, self._norm_inv_scales[:d], out=normalized)
+        np.clip(normalized, 0, 1, out=normalized)
+
+        # sqrt(dot) rather than np.linalg.norm: for a 16-element vector
+        # the norm call is dominated by its own dispatch overhead
+        norm = math.sqrt(float(np.dot(normalized, normalized)))
         if norm > 0:
-            normalized = normalized / norm
-        
+            normalized /= norm
+
         return normalized
-    
+
     def process_batch(self, feature_list: List[Dict[str, Any]]) -> np.ndarray:
         """Process multiple feature dictionaries into matrix"""
-        vectors = []
-        
-        for features in feature_list:
-            vector = self.create_feature_vector(features)
-            vectors.append(vector)
-        
-        return np.array(vectors, dtype=np.float32)
+        matrix = np.zeros((len(feature_list), len(self._order_tuple)), dtype=np.float32)
+
+        # Column-wise gather: one Python pass per feature instead of a
+        # full create_feature_vector call per row
+        for i, feature_name in enumerate(self._order_tuple):
+            matrix[:, i] = [features.get(feature_name, 0.0) for features in feature_list]
+
+        # Normalize all rows in one fused kernel call
+        return _normalize_batch(matrix, self._norm_offsets, self._norm_inv_scales)
     
     def reduce_dimensions(self, vectors: np.ndarray, n_components: int = 50) -> np.ndarray:
         """
@@ -98,15 +191,20 @@ class FeatureProcessor:
         Returns:
             Reduced dimension vectors
         """
-        from sklearn.decomposition import PCA
-        
         if vectors.shape[0] < n_components:
             return vectors
-        
-        pca = PCA(n_components=n_components)
-        reduced = pca.fit_transform(vectors)
-        
+
+        # Reuse the fitted transform; fit_transform recomputes the SVD
+        # over the whole matrix on every call
+        if (self._pca is not None
+                and self._pca.n_components == n_components
+                and self._pca.n_features_in_ == vectors.shape[1]):
+            return self._pca.transform(vectors)
+
+        self._pca = PCA(n_components=n_components)
+        reduced = self._pca.fit_transform(vectors)
+
         logger.info(f"Reduced dimensions from {vectors.shape[1]} to {reduced.shape[1]}")
-        logger.info(f"Explained variance ratio: {sum(pca.explained_variance_ratio_):.2f}")
-        
+        logger.info(f"Explained variance ratio: {sum(self._pca.explained_variance_ratio_):.2f}")
+
         return reduced
\ No newline at end of file
@@ -2,6 +2,7 @@
 Client utilities and similarity index
 """
 
+import json
 import logging
 import os
 from typing import List, Tuple, Optional
@@ -13,17 +14,64 @@ logger = logging.getLogger(__name__)
 
 
 class SimilarityIndex:
-    """FAISS-based similarity index for fast nearest neighbor search"""
-    
-    def __init__(self, index_path: Optional[str] = None):
+    """FAISS-based similarity index for fast nearest neighbor search
+
+    All vectors are L2-normalized on the way into the index (build, add,
+    and query), and every index variant uses METRIC_INNER_PRODUCT. On
+    unit vectors the inner product is the cosine similarity, so search
+    scores are similarities in [-1, 1] with no per-candidate sqrt or
+    divide, and the reported distance is 1 - similarity (0 for an exact
+    self-match).
+    """
+
+    # Below this corpus size exact flat search is both faster than graph
+    # traversal and gives exact recall; above it HNSW wins
+    AUTO_HNSW_THRESHOLD = 1024
+
+    def __init__(self, index_path: Optional[str] = None, index_type: str = 'auto',
+                 m: int = 32, ef_construction: int = 40, ef_search: int = 16,
+                 mmap: bool = True, index_gpu: bool = False,
+                 quantize: Optional[str] = None,
+                 num_threads: Optional[int] = None):
+        if quantize not in (None, 'sq8', 'pq'):
+            raise ValueError(f"Unsupported quantization: {quantize}")
+
+        # FAISS's OpenMP pool is process-wide; for tiny single-query
+        # searches the fork/join is pure overhead, so callers (and the
+        # unit tests) can pin it down
+        if num_threads is not None:
+            faiss.omp_set_num_threads(num_threads)
+
         self.index_path = index_path or os.environ.get('FAISS_INDEX_PATH', '/data/index')
         self.index = None
         self.item_ids = []
         self.dimension = None
-        
+        self.index_type = index_type
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.mmap = mmap
+        self.index_gpu = index_gpu
+        self.quantize = quantize
+        self._on_gpu = False
+        self._read_only = False
+
         # Try to load existing index
         self._load_index()
     
+    @staticmethod
+    def _ids_array(item_ids) -> np.ndarray:
+        """Fixed-width unicode array sized to the longest ID
+
+        numpy silently truncates strings that exceed a hardcoded width,
+        so the width is derived per batch instead -- same contiguous
+        single-block layout, no ID corruption.
+        """
+        if isinstance(item_ids, np.ndarray) and item_ids.dtype.kind == 'U':
+            return item_ids
+        width = max((len(item_id) for item_id in item_ids), default=1)
+        return np.asarray(item_ids, dtype=f'U{max(width, 1)}')
+
     def build(self, vectors: np.ndarray, item_ids: List[str]):
         """
         Build similarity index from feature vectors
@@ -36,15 +84,107 @@ class SimilarityIndex:
             raise ValueError("Number of vectors must match number of item IDs")
         
         self.dimension = vectors.shape[1]
-        self.item_ids = item_ids
+        # Fixed-width array rather than a list of str objects: saves and
+        # loads as one contiguous block instead of N Python strings
+        self.item_ids = self._ids_array(item_ids)
         
+        # Cosine similarity equals inner product on unit vectors, so
+        # normalize once here and search with METRIC_INNER_PRODUCT --
+        # no sqrt per candidate and scores are similarities directly.
+        # normalize_L2 writes in place, and the input may be read-only
+        # (np.frombuffer over protobuf bytes) or owned by the caller,
+        # so always normalize a fresh contiguous copy
+        vectors = np.array(vectors, dtype=np.float32, order='C')
+        faiss.normalize_L2(vectors)
+
         # Create FAISS index
-        # Using IndexHNSWFlat for good performance/accuracy tradeoff
-        self.index = faiss.IndexHNSWFlat(self.dimension, 32)
-        self.index.hnsw.efConstruction = 40
-        
-        # Add vectors to index
+        index_type = self.index_type
+        if index_type == 'auto':
+            index_type = 'flat' if len(vectors) < self.AUTO_HNSW_THRESHOLD else 'hnsw'
+
+        if self.quantize == 'pq':
+            # The PQ index is IVF-based whatever index_type resolved to;
+            # record that so the mmap gate on load treats it like any
+            # other inverted-list index
+            index_type = 'ivf'
+            # Product quantization for very large corpora: smallest
+            # codes, highest distance throughput, lowest recall. The
+            # codebook sizes scale with the corpus -- PQ k-means needs
+            # at least 2**nbits training points per subquantizer and the
+            # coarse quantizer at least nlist -- and the OPQ rotation is
+            # only worth training once there's enough data for it
+            n = len(vectors)
+            nlist = min(64, max(4, int(np.sqrt(n))))
+            nbits = min(8, max(4, int(np.log2(max(n, 16)))))
+            opq = "OPQ8_16," if n >= 256 else ""
+            self.index = faiss.index_factory(
+                self.dimension, f"{opq}IVF{nlist},PQ8x{nbits}",
+                faiss.METRIC_INNER_PRODUCT
+            )
+            faiss.extract_index_ivf(self.index).nprobe = min(max(nlist // 4, 1), 10)
+        elif index_type == 'flat':
+            if self.quantize == 'sq8':
+                # Exhaustive search over 8-bit codes: 4x less memory and
+                # SIMD int8 distance kernels, still scanning every item
+                self.index = faiss.IndexScalarQuantizer(
+                    self.dimension, faiss.ScalarQuantizer.QT_8bit,
+                    faiss.METRIC_INNER_PRODUCT
+                )
+            else:
+                # Exact inner-product search for small corpora
+                self.index = faiss.IndexFlatIP(self.dimension)
+        elif index_type == 'ivf':
+            # Inverted lists for mid-sized corpora where HNSW's graph
+            # memory is prohibitive: roughly m * nprobe / nlist distance
+            # evaluations per query instead of m
+            nlist = max(int(2 * np.sqrt(len(vectors))), 20)
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            if self.quantize == 'sq8':
+                # Inverted lists over 8-bit codes: same probe behavior,
+                # 4x less list memory
+                self.index = faiss.IndexIVFScalarQuantizer(
+                    quantizer, self.dimension, nlist,
+                    faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+                )
+            else:
+                self.index = faiss.IndexIVFFlat(
+                    quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT
+                )
+            self.index.nprobe = min(nlist // 4, 10)
+        else:
+            if self.quantize == 'sq8':
+                # HNSW over 8-bit scalar-quantized vectors: 4x less
+                # vector memory and SIMD int8 distance kernels in search
+                self.index = faiss.IndexHNSWSQ(
+                    self.dimension, faiss.ScalarQuantizer.QT_8bit, self.m,
+                    faiss.METRIC_INNER_PRODUCT
+                )
+            else:
+                self.index = faiss.IndexHNSWFlat(
+                    self.dimension, self.m, faiss.METRIC_INNER_PRODUCT
+                )
+            self.index.hnsw.efConstruction = self.ef_construction
+            self.index.hnsw.efSearch = self.ef_search
+
+        self._built_type = index_type
+
+        # Flat indexes need no training; the SQ variant trains its quantizer
+        if not self.index.is_trained:
+            self.index.train(vectors)
         self.index.add(vectors)
+
+        # Move the filled index to GPU when requested and available.
+        # Distance computation is embarrassingly parallel across
+        # (query, item) pairs, so brute-force/IVF search gains the most.
+        # faiss-cpu builds don't ship the GPU symbols, hence the guard.
+        self._on_gpu = False
+        if self.index_gpu:
+            try:
+                if faiss.get_num_gpus() > 0:
+                    self.index = faiss.index_cpu_to_all_gpus(self.index)
+                    self._on_gpu = True
+            except AttributeError:
+                logger.warning("GPU FAISS not available, keeping index on CPU")
         
         logger.info(f"Built index with {len(vectors)} vectors of dimension {self.dimension}")
         
@@ -62,27 +202,54 @@ class SimilarityIndex:
         Returns:
             List of (item_id, distance, similarity) tuples
         """
+        return self.search_batch(query_vector, k)[0]
+
+    def search_batch(self, query_vectors: np.ndarray, k: int = 10) -> List[List[Tuple[str, float, float]]]:
+        """
+        Search for similar items for a whole batch of queries
+
+        FAISS parallelizes over the query axis, so one search call on a
+        stacked (B, D) matrix amortizes dispatch overhead across B
+        queries instead of paying it per query.
+
+        Args:
+            query_vectors: Query matrix (n_queries, n_features) or a
+                single 1-D query vector
+            k: Number of results per query
+
+        Returns:
+            One list of (item_id, distance, similarity) tuples per query
+        """
         if self.index is None:
             raise RuntimeError("Index not built or loaded")
-        
-        # Ensure query vector has correct shape
-        if query_vector.ndim == 1:
-            query_vector = query_vector.reshape(1, -1)
-        
-        # Search
-        distances, indices = self.index.search(query_vector, k)
-        
-        # Convert to results
-        results = []
-        for i in range(len(indices[0])):
-            idx = indices[0][i]
-            if idx < len(self.item_ids):  # Valid index
-                distance = distances[0][i]
-                # Convert distance to similarity (1 - normalized distance)
-                similarity = 1.0 / (1.0 + distance)
-                results.append((self.item_ids[idx], distance, similarity))
-        
-        return results
+
+        # Queries are copied before the in-place normalize_L2 so the
+        # caller's array is never silently unit-scaled under them
+        queries = np.array(query_vectors, dtype=np.float32, order='C').reshape(
+            -1, self.dimension
+        )
+        faiss.normalize_L2(queries)
+
+        # Search: inner-product scores are cosine similarities
+        scores, indices = self.index.search(queries, k)
+        distances = 1.0 - scores
+
+        batch_results = []
+        for row in range(indices.shape[0]):
+            results = []
+            for i in range(indices.shape[1]):
+                idx = indices[row][i]
+                # FAISS pads missing neighbors with -1 (k > ntotal, or
+                # IVF probes finding too few candidates)
+                if 0 <= idx < len(self.item_ids):
+                    results.append((
+                        str(self.item_ids[idx]),
+                        float(distances[row][i]),
+                        float(scores[row][i])
+                    ))
+            batch_results.append(results)
+
+        return batch_results
     
     def add_items(self, vectors: np.ndarray, item_ids: List[str]):
         """Add new items to existing index"""
@@ -90,51 +257,126 @@ class SimilarityIndex:
             # First items - build new index
             self.build(vectors, item_ids)
             return
-        
-        # Add to existing index
+
+        if self._read_only:
+            # A memory-mapped load is read-only; re-read a writable copy
+            # (carrying over nprobe) before mutating the inverted lists
+            nprobe = getattr(self.index, 'nprobe', None)
+            self.index = faiss.read_index(os.path.join(self.index_path, 'faiss.index'))
+            if nprobe is not None and hasattr(self.index, 'nprobe'):
+                self.index.nprobe = nprobe
+            self._read_only = False
+
+        # Add to existing index (normalized to match the build path,
+        # again on a copy rather than the caller's array)
+        vectors = np.array(vectors, dtype=np.float32, order='C')
+        faiss.normalize_L2(vectors)
         self.index.add(vectors)
-        self.item_ids.extend(item_ids)
+        # concatenate promotes to the wider of the two string widths
+        self.item_ids = np.concatenate([
+            self._ids_array(self.item_ids),
+            self._ids_array(item_ids)
+        ])
         
         logger.info(f"Added {len(vectors)} items to index")
         self._save_index()
     
     def _save_index(self):
-        """Save index to disk"""
+        """Save index to disk
+
+        Readers may have the index file memory-mapped, so each file is
+        written to a temp name and swapped into place with os.replace
+        rather than overwritten live: mmap'd readers keep the old pages,
+        new readers open the new file.
+        """
         os.makedirs(self.index_path, exist_ok=True)
-        
-        # Save FAISS index
+
+        # Save FAISS index (GPU indexes serialize via a CPU clone)
         index_file = os.path.join(self.index_path, 'faiss.index')
-        faiss.write_index(self.index, index_file)
-        
-        # Save metadata
-        metadata = {
-            'item_ids': self.item_ids,
-            'dimension': self.dimension
-        }
-        metadata_file = os.path.join(self.index_path, 'metadata.pkl')
-        with open(metadata_file, 'wb') as f:
-            pickle.dump(metadata, f)
-        
+        index_to_write = self.index
+        if self._on_gpu:
+            index_to_write = faiss.index_gpu_to_cpu(self.index)
+        faiss.write_index(index_to_write, index_file + '.tmp')
+        os.replace(index_file + '.tmp', index_file)
+
+        # Save item IDs as one contiguous fixed-width array: a single
+        # memcpy to write and memory-mappable on load, against pickling
+        # or formatting one Python string per ID. The temp name keeps
+        # the .npy suffix so np.save doesn't append another one.
+        ids_file = os.path.join(self.index_path, 'ids.npy')
+        ids_tmp = os.path.join(self.index_path, 'ids.tmp.npy')
+        np.save(ids_tmp, self._ids_array(self.item_ids))
+        os.replace(ids_tmp, ids_file)
+
+        metadata = {'dimension': self.dimension}
+        # Persist the built type (load uses it to decide whether to mmap)
+        # and search-time parameters so a reload searches identically
+        if getattr(self, '_built_type', None):
+            metadata['index_type'] = self._built_type
+        if self.quantize:
+            metadata['quantize'] = self.quantize
+        if hasattr(self.index, 'nprobe'):
+            metadata['nprobe'] = int(self.index.nprobe)
+
+        metadata_file = os.path.join(self.index_path, 'metadata.json')
+        with open(metadata_file + '.tmp', 'w') as f:
+            json.dump(metadata, f)
+        os.replace(metadata_file + '.tmp', metadata_file)
+
         logger.info(f"Saved index to {self.index_path}")
     
     def _load_index(self):
         """Load index from disk"""
         index_file = os.path.join(self.index_path, 'faiss.index')
-        metadata_file = os.path.join(self.index_path, 'metadata.pkl')
-        
-        if os.path.exists(index_file) and os.path.exists(metadata_file):
-            try:
-                # Load FAISS index
+        ids_file = os.path.join(self.index_path, 'ids.npy')
+        metadata_file = os.path.join(self.index_path, 'metadata.json')
+        legacy_metadata_file = os.path.join(self.index_path, 'metadata.pkl')
+
+        if not os.path.exists(index_file):
+            return
+
+        try:
+            metadata = None
+            if os.path.exists(metadata_file):
+                with open(metadata_file, 'r') as f:
+                    metadata = json.load(f)
+
+            # Memory-map IVF indexes so inverted-list pages fault in on
+            # demand and the page cache is shared across workers. Flat
+            # and HNSW indexes are touched almost entirely on the first
+            # search, so a plain read is faster for them.
+            use_mmap = (self.mmap and metadata is not None
+                        and metadata.get('index_type') == 'ivf')
+            self._read_only = False
+            if use_mmap:
+                try:
+                    self.index = faiss.read_index(
+                        index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                    )
+                    self._read_only = True
+                except RuntimeError:
+                    # Not every index build supports mmap; read fully
+                    self.index = faiss.read_index(index_file)
+            else:
                 self.index = faiss.read_index(index_file)
-                
-                # Load metadata
-                with open(metadata_file, 'rb') as f:
+
+            if metadata is not None and os.path.exists(ids_file):
+                # Memory-map the ID array: zero-copy, page-cached access
+                self.item_ids = np.load(ids_file, mmap_mode='r')
+                self.dimension = metadata['dimension']
+                if 'nprobe' in metadata and hasattr(self.index, 'nprobe'):
+                    self.index.nprobe = metadata['nprobe']
+            elif os.path.exists(legacy_metadata_file):
+                # Fall back to pickled metadata from older index builds
+                with open(legacy_metadata_file, 'rb') as f:
                     metadata = pickle.load(f)
-                
                 self.item_ids = metadata['item_ids']
                 self.dimension = metadata['dimension']
-                
-                logger.info(f"Loaded index with {len(self.item_ids)} items")
-            except Exception as e:
-                logger.error(f"Error loading index: {str(e)}")
-                self.index = None
\ No newline at end of file
+            else:
+                self.index = None
+                return
+
+            logger.info(f"Loaded index with {len(self.item_ids)} items")
+        except Exception as e:
+            logger.error(f"Error loading index: {str(e)}")
+            self.index = None
\ No newline at end of file
@@ -8,9 +8,14 @@ import os
 import sys
 import logging
 import asyncio
+import queue
+import threading
+import time
 from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import grpc
 import numpy as np
+import faiss
 from typing import Dict, List, Optional, Tuple
 
 # Add parent directory to path for imports
@@ -28,13 +33,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Process-wide analyzer/processor singletons. Essentia algorithms are
+# not thread-safe, so every process (the server itself and each pool
+# worker) holds exactly one analyzer instead of one per service object.
+# In the server process the gRPC thread pool can run several
+# AnalyzeTrack RPCs at once against that single analyzer, whose cached
+# algorithms (loader reconfiguration, the streaming network's shared
+# Pool) carry mutable C++ state -- so all analysis in this process goes
+# through _ANALYZER_LOCK. Pool workers execute one task at a time and
+# need no locking.
+_ANALYZER = None
+_ANALYZER_LOCK = threading.Lock()
+_PROCESSOR = None
+
+# Lazily-created process pool shared by all batch requests
+_analysis_pool = None
+
+
+def _get_analyzer() -> AudioAnalyzer:
+    """Get or create this process's analyzer"""
+    global _ANALYZER
+    if _ANALYZER is None:
+        _ANALYZER = AudioAnalyzer()
+    return _ANALYZER
+
+
+def _get_processor() -> FeatureProcessor:
+    """Get or create this process's feature processor"""
+    global _PROCESSOR
+    if _PROCESSOR is None:
+        _PROCESSOR = FeatureProcessor()
+    return _PROCESSOR
+
+
+def _init_worker():
+    """Initialize the per-process analyzer in a pool worker
+
+    Runs in the pool initializer so workers pay algorithm construction
+    and streaming-graph build once, not on their first file.
+    """
+    analyzer = _get_analyzer()
+    analyzer._build_streaming_network()
+    _get_processor()
+
+
+def _analyze_one(file_path: str, depth: str, descriptors: List[str]) -> Dict:
+    """Analyze a single file in a pool worker (must be picklable)"""
+    return _get_analyzer().analyze_file(file_path, depth=depth, descriptors=descriptors)
+
+
+def _decode_vector(buf: bytes, dimension: Optional[int] = None) -> np.ndarray:
+    """Decode a wire feature vector as float32
+
+    Vectors are serialized as FP16 on the wire (normalized features fit
+    its range and it halves the payload), but FP32 payloads from older
+    clients are still accepted. The element size is probed against the
+    expected dimension when one is known.
+    """
+    if dimension and len(buf) == 2 * dimension:
+        return np.frombuffer(buf, dtype=np.float16).astype(np.float32)
+    if len(buf) % 4 == 0:
+        return np.frombuffer(buf, dtype=np.float32)
+    return np.frombuffer(buf, dtype=np.float16).astype(np.float32)
+
+
+def _get_analysis_pool() -> ProcessPoolExecutor:
+    """Get or create the shared analysis process pool"""
+    global _analysis_pool
+    if _analysis_pool is None:
+        _analysis_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            initializer=_init_worker
+        )
+    return _analysis_pool
+
 
 class AnalysisService(analysis_pb2_grpc.AnalysisServicer):
     """gRPC service implementation for audio analysis"""
     
     def __init__(self):
-        self.analyzer = AudioAnalyzer()
-        self.processor = FeatureProcessor()
+        self.analyzer = _get_analyzer()
+        self.processor = _get_processor()
         logger.info("Analysis service initialized")
     
     def AnalyzeTrack(self, request, context):
@@ -42,24 +121,42 @@ class AnalysisService(analysis_pb2_grpc.AnalysisServicer):
         try:
             logger.info(f"Analyzing track: {request.file_path}")
             
-            # Extract features
-            features = self.analyzer.analyze_file(
-                request.file_path,
-                depth=request.depth,
-                descriptors=list(request.descriptors)
-            )
+            # Extract features. The analyzer's cached Essentia
+            # algorithms are single-threaded state, so concurrent RPCs
+            # take turns rather than racing on them.
+            with _ANALYZER_LOCK:
+                features = self.analyzer.analyze_file(
+                    request.file_path,
+                    depth=request.depth,
+                    descriptors=list(request.descriptors)
+                )
             
             # Process into feature vector
             feature_vector = self.processor.create_feature_vector(features)
-            
-            # Convert features to string format for protobuf
-            string_features = {k: str(v) for k, v in features.items()}
-            
-            return analysis_pb2.AnalysisResponse(
+
+            # MFCCs travel as raw floats; everything else is partitioned
+            # once into typed maps instead of stringifying every value
+            mfcc_mean = features.pop('mfcc_mean', None)
+
+            numeric_features = {}
+            text_features = {}
+            for k, v in features.items():
+                if isinstance(v, str):
+                    text_features[k] = v
+                else:
+                    numeric_features[k] = float(v)
+
+            response = analysis_pb2.AnalysisResponse(
                 file_path=request.file_path,
-                features=string_features,
-                feature_vector=feature_vector.tobytes()
+                numeric_features=numeric_features,
+                text_features=text_features,
+                # L2-normalized features fit FP16; halves the wire bytes
+                feature_vector=feature_vector.astype(np.float16).tobytes()
             )
+            if mfcc_mean is not None:
+                response.mfcc_mean.extend(np.asarray(mfcc_mean, dtype=np.float32).tolist())
+
+            return response
             
         except Exception as e:
             logger.error(f"Error analyzing {request.file_path}: {str(e)}")
@@ -71,27 +168,32 @@ class AnalysisService(analysis_pb2_grpc.AnalysisServicer):
             )
     
     def AnalyzeBatch(self, request, context):
-        """Analyze multiple tracks with progress updates"""
+        """Analyze multiple tracks in parallel with progress updates"""
         total = len(request.file_paths)
         completed = 0
         errors = 0
-        
-        for file_path in request.file_paths:
+
+        # Analysis is CPU-bound per file but embarrassingly parallel
+        # across files, so fan out over the process pool and report
+        # progress as files finish rather than in submission order
+        pool = _get_analysis_pool()
+        descriptors = list(request.descriptors)
+
+        future_to_path = {
+            pool.submit(_analyze_one, file_path, request.depth, descriptors): file_path
+            for file_path in request.file_paths
+        }
+
+        for future in as_completed(future_to_path):
+            file_path = future_to_path[future]
             try:
-                # Analyze single file
-                single_request = analysis_pb2.AnalysisRequest(
-                    file_path=file_path,
-                    depth=request.depth,
-                    descriptors=request.descriptors
-                )
-                
-                self.AnalyzeTrack(single_request, context)
+                future.result()
                 completed += 1
-                
+
             except Exception as e:
                 logger.error(f"Error in batch analysis: {str(e)}")
                 errors += 1
-            
+
             # Send progress update
             progress = analysis_pb2.AnalysisProgress(
                 total=total,
@@ -103,33 +205,104 @@ class AnalysisService(analysis_pb2_grpc.AnalysisServicer):
             yield progress
 
 
+class _QueryBatcher:
+    """Coalesce concurrent similarity queries into single FAISS searches
+
+    A single-query HNSW search runs on one thread, but FAISS parallelizes
+    across the query axis. Queries landing within a short window are
+    stacked into one matrix and searched in a single call, amortizing
+    per-search overhead across concurrent RPCs.
+    """
+
+    def __init__(self, index: SimilarityIndex, max_batch: int = 64, wait_ms: float = 2.0):
+        self._index = index
+        self._max_batch = max_batch
+        self._wait_s = wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[str, float, float]]:
+        """Submit a query and block until its batch has been searched"""
+        entry = {
+            'vector': query_vector,
+            'k': k,
+            'event': threading.Event(),
+            'results': None,
+            'error': None,
+        }
+        self._queue.put(entry)
+        entry['event'].wait()
+
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['results']
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            batch = [entry]
+
+            # Collect whatever else arrives within the wait window
+            deadline = time.monotonic() + self._wait_s
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            self._search_batch(batch)
+
+    def _search_batch(self, batch):
+        try:
+            k = max(entry['k'] for entry in batch)
+            queries = np.vstack([entry['vector'] for entry in batch])
+
+            # One FAISS call over the whole stacked batch
+            all_results = self._index.search_batch(queries, k)
+
+            for entry, results in zip(batch, all_results):
+                entry['results'] = results[:entry['k']]
+
+        except Exception as e:
+            for entry in batch:
+                entry['error'] = e
+
+        finally:
+            for entry in batch:
+                entry['event'].set()
+
+
 class SimilarityService(analysis_pb2_grpc.SimilarityServicer):
     """gRPC service implementation for similarity search"""
-    
+
     def __init__(self):
         self.index = SimilarityIndex()
+        self.batcher = _QueryBatcher(self.index)
         logger.info("Similarity service initialized")
-    
+
     def FindSimilar(self, request, context):
         """Find similar tracks based on feature vector"""
         try:
-            # Convert bytes back to numpy array
-            query_vector = np.frombuffer(request.feature_vector, dtype=np.float32)
-            
-            # Search index
-            matches = self.index.search(query_vector, k=request.top_k)
+            # Convert bytes back to numpy array (FP16 or FP32 wire format)
+            query_vector = _decode_vector(request.feature_vector, self.index.dimension)
+
+            # Search index (coalesced with concurrent queries)
+            matches = self.batcher.search(query_vector, k=request.top_k)
             
-            # Convert to protobuf format
-            similarity_matches = []
+            # Fill the repeated field in place -- no intermediate Python
+            # list of SimilarityMatch objects that protobuf then re-copies
+            response = analysis_pb2.SimilarityResponse()
             for item_id, distance, similarity in matches:
-                match = analysis_pb2.SimilarityMatch(
-                    item_id=item_id,
-                    similarity=similarity,
-                    distance=distance
-                )
-                similarity_matches.append(match)
-            
-            return analysis_pb2.SimilarityResponse(matches=similarity_matches)
+                match = response.matches.add()
+                match.item_id = item_id
+                match.similarity = similarity
+                match.distance = distance
+
+            return response
             
         except Exception as e:
             logger.error(f"Error in similarity search: {str(e)}")
@@ -140,17 +313,18 @@ class SimilarityService(analysis_pb2_grpc.SimilarityServicer):
     def BuildIndex(self, request, context):
         """Build similarity index from feature vectors"""
         try:
-            # Extract vectors and IDs
-            vectors = []
-            item_ids = []
-            
-            for item in request.items:
-                vector = np.frombuffer(item.feature_vector, dtype=np.float32)
-                vectors.append(vector)
-                item_ids.append(item.item_id)
-            
+            # Decode each payload by its own length into one preallocated
+            # matrix. A plugin database rebuilt after the FP16 switch
+            # legitimately holds a mix of old FP32 and new FP16 rows, so
+            # the element width has to be probed per item, not per batch.
+            dimension = len(_get_processor().feature_order)
+            vectors = np.empty((len(request.items), dimension), dtype=np.float32)
+            for i, item in enumerate(request.items):
+                vectors[i] = _decode_vector(item.feature_vector, dimension)
+            item_ids = [item.item_id for item in request.items]
+
             # Build index
-            self.index.build(np.array(vectors), item_ids)
+            self.index.build(vectors, item_ids)
             
             return analysis_pb2.BuildIndexResponse(
                 success=True,
@@ -167,6 +341,12 @@ class SimilarityService(analysis_pb2_grpc.SimilarityServicer):
 
 def serve():
     """Start the gRPC server"""
+    # FAISS parallelizes over the query axis with OpenMP; give it all
+    # cores. Set here rather than at import so merely importing this
+    # module (e.g. from the tests) doesn't override the process's
+    # thread configuration.
+    faiss.omp_set_num_threads(os.cpu_count())
+
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     
     # Add services
@@ -1,5 +1,6 @@
 using System;
 using System.Collections.Generic;
+using System.Globalization;
 using System.Linq;
 using System.Threading;
 using System.Threading.Tasks;
@@ -173,38 +174,46 @@ namespace JellySentia.Services
                 {
                     ItemId = item.Id.ToString(),
                     FilePath = item.Path,
-                    Tempo = response.Features.GetValueOrDefault("tempo"),
-                    Key = response.Features.GetValueOrDefault("key"),
-                    Scale = response.Features.GetValueOrDefault("scale"),
-                    Energy = response.Features.GetValueOrDefault("energy"),
-                    Danceability = response.Features.GetValueOrDefault("danceability"),
-                    Valence = response.Features.GetValueOrDefault("valence"),
-                    Acousticness = response.Features.GetValueOrDefault("acousticness"),
-                    Instrumentalness = response.Features.GetValueOrDefault("instrumentalness"),
-                    Speechiness = response.Features.GetValueOrDefault("speechiness"),
-                    Loudness = response.Features.GetValueOrDefault("loudness"),
-                    SpectralCentroid = response.Features.GetValueOrDefault("spectral_centroid"),
-                    SpectralRolloff = response.Features.GetValueOrDefault("spectral_rolloff"),
-                    ZeroCrossingRate = response.Features.GetValueOrDefault("zero_crossing_rate"),
-                    MfccMean = response.Features.GetValueOrDefault("mfcc_mean"),
-                    ChromaMean = response.Features.GetValueOrDefault("chroma_mean"),
+                    Tempo = response.NumericFeatures.GetValueOrDefault("tempo"),
+                    Key = response.TextFeatures.GetValueOrDefault("key"),
+                    Scale = response.TextFeatures.GetValueOrDefault("scale"),
+                    Energy = response.NumericFeatures.GetValueOrDefault("energy"),
+                    Danceability = response.NumericFeatures.GetValueOrDefault("danceability"),
+                    Valence = response.NumericFeatures.GetValueOrDefault("valence"),
+                    Acousticness = response.NumericFeatures.GetValueOrDefault("acousticness"),
+                    Instrumentalness = response.NumericFeatures.GetValueOrDefault("instrumentalness"),
+                    Speechiness = response.NumericFeatures.GetValueOrDefault("speechiness"),
+                    Loudness = response.NumericFeatures.GetValueOrDefault("loudness"),
+                    SpectralCentroid = response.NumericFeatures.GetValueOrDefault("spectral_centroid"),
+                    SpectralRolloff = response.NumericFeatures.GetValueOrDefault("spectral_rolloff"),
+                    ZeroCrossingRate = response.NumericFeatures.GetValueOrDefault("zero_crossing_rate"),
+                    MfccMean = string.Join(",", response.MfccMean.Select(v => v.ToString(CultureInfo.InvariantCulture))),
+                    ChromaMean = response.TextFeatures.GetValueOrDefault("chroma_mean"),
                     FeatureVector = response.FeatureVector.ToByteArray()
                 });
         }
 
+        private static string FormatNumericTag(AnalysisResponse response, string name)
+        {
+            return response.NumericFeatures.TryGetValue(name, out var value)
+                ? value.ToString(CultureInfo.InvariantCulture)
+                : "";
+        }
+
         private async Task WriteTagsToFile(string filePath, AnalysisResponse response)
         {
             try
             {
                 var file = TagLib.File.Create(filePath);
                 
-                // Write custom tags
-                file.Tag.SetCustomTag("TEMPO", response.Features.GetValueOrDefault("tempo", ""));
-                file.Tag.SetCustomTag("KEY", response.Features.GetValueOrDefault("key", ""));
-                file.Tag.SetCustomTag("ENERGY", response.Features.GetValueOrDefault("energy", ""));
-                file.Tag.SetCustomTag("DANCEABILITY", response.Features.GetValueOrDefault("danceability", ""));
-                file.Tag.SetCustomTag("VALENCE", response.Features.GetValueOrDefault("valence", ""));
-                file.Tag.SetCustomTag("ACOUSTICNESS", response.Features.GetValueOrDefault("acousticness", ""));
+                // Write custom tags (numeric values are stringified here,
+                // at the edge, rather than on the wire)
+                file.Tag.SetCustomTag("TEMPO", FormatNumericTag(response, "tempo"));
+                file.Tag.SetCustomTag("KEY", response.TextFeatures.GetValueOrDefault("key", ""));
+                file.Tag.SetCustomTag("ENERGY", FormatNumericTag(response, "energy"));
+                file.Tag.SetCustomTag("DANCEABILITY", FormatNumericTag(response, "danceability"));
+                file.Tag.SetCustomTag("VALENCE", FormatNumericTag(response, "valence"));
+                file.Tag.SetCustomTag("ACOUSTICNESS", FormatNumericTag(response, "acousticness"));
                 
                 await Task.Run(() => file.Save());
             }
@@ -0,0 +1,10 @@
+"""
+Shared unit-test configuration
+"""
+
+import faiss
+
+# The unit tests issue tiny searches (k=5 over 100 vectors); FAISS's
+# default all-cores OpenMP pool costs more in fork/join than the search
+# itself, and single-threaded runs are bitwise reproducible
+faiss.omp_set_num_threads(1)
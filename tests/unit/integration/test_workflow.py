@@ -76,9 +76,9 @@ class TestIntegrationWorkflow:
             response = stub.AnalyzeTrack(request)
             
             assert response.file_path == test_audio_file
-            assert 'tempo' in response.features
-            assert 'energy' in response.features
-            assert 'danceability' in response.features
+            assert 'tempo' in response.numeric_features
+            assert 'energy' in response.numeric_features
+            assert 'danceability' in response.numeric_features
             assert len(response.feature_vector) > 0
             
         except grpc.RpcError as e:
@@ -4,7 +4,6 @@ Unit tests for analysis core
 
 import pytest
 import numpy as np
-import tempfile
 import os
 from unittest.mock import Mock, patch
 
@@ -24,14 +23,18 @@ class TestAudioAnalyzer:
     def analyzer(self):
         return AudioAnalyzer()
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def sample_audio(self):
-        """Create a simple sine wave for testing"""
+        """Create a simple sine wave once per module
+
+        Generated in float32 throughout (no float64 intermediate) and
+        frozen so tests sharing the buffer can't mutate it.
+        """
         sample_rate = 44100
-        duration = 1.0
         frequency = 440.0
-        t = np.linspace(0, duration, int(sample_rate * duration))
-        audio = np.sin(2 * np.pi * frequency * t).astype(np.float32)
+        t = np.arange(sample_rate, dtype=np.float32) / sample_rate
+        audio = np.sin(2 * np.pi * frequency * t, dtype=np.float32)
+        audio.setflags(write=False)
         return audio
     
     def test_analyzer_initialization(self, analyzer):
@@ -41,13 +44,17 @@ class TestAudioAnalyzer:
         assert analyzer.hop_size == 1024
     
     @patch('analysis_core.algorithms.extractors.es.MonoLoader')
-    def test_load_audio(self, mock_loader, analyzer, sample_audio):
+    def test_load_audio(self, mock_loader, sample_audio):
         """Test audio loading"""
+        # The loader is constructed once in __init__ and reconfigured
+        # per file, so patch before building the analyzer.
         mock_loader.return_value = Mock(return_value=sample_audio)
-        
+        analyzer = AudioAnalyzer()
+
         audio = analyzer._load_audio('test.mp3')
-        
+
         assert len(audio) == len(sample_audio)
+        # Cached on the analyzer: one construction, however many loads
         mock_loader.assert_called_once()
     
     def test_extract_basic_features(self, analyzer, sample_audio):
@@ -64,25 +71,29 @@ class TestAudioAnalyzer:
         assert 0 <= features['energy'] <= 1
     
     @patch('analysis_core.algorithms.extractors.es.RhythmExtractor2013')
-    def test_extract_rhythm_features(self, mock_rhythm, analyzer, sample_audio):
+    def test_extract_rhythm_features(self, mock_rhythm, sample_audio):
         """Test rhythm feature extraction"""
-        # Mock rhythm extractor output
+        # Mock rhythm extractor output. The extractor is constructed once
+        # in __init__ and reused, so patch before building the analyzer.
         mock_rhythm.return_value = Mock(
             return_value=(120.0, np.array([0.5, 1.0, 1.5]), 0.95, None, None)
         )
-        
+        analyzer = AudioAnalyzer()
+
         features = analyzer._extract_rhythm_features(sample_audio)
-        
+
         assert 'tempo' in features
         assert 'beats_confidence' in features
         assert 'beat_count' in features
-        assert 'onset_rate' in features
         assert 'danceability' in features
-        
+
         assert features['tempo'] == 120.0
         assert features['beats_confidence'] == 0.95
         assert features['beat_count'] == 3
 
+        # Cached on the analyzer: one construction, however many calls
+        mock_rhythm.assert_called_once()
+
 
 class TestFeatureProcessor:
     """Test feature processing functionality"""
@@ -162,17 +173,20 @@ class TestSimilarityIndex:
     """Test similarity index functionality"""
     
     @pytest.fixture
-    def index(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            return SimilarityIndex(index_path=tmpdir)
+    def index(self, tmp_path):
+        # pytest's tmp_path reuses a session tmp root (bulk cleanup, no
+        # per-test rmdir) and, unlike the old TemporaryDirectory-in-with
+        # version, the directory still exists when the test runs
+        return SimilarityIndex(index_path=str(tmp_path))
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def sample_vectors(self):
-        # Create some random vectors for testing
-        np.random.seed(42)
-        return np.random.rand(100, 16).astype(np.float32)
-    
-    @pytest.fixture
+        # Generated once per module, directly in float32 (no float64
+        # intermediate and downcast like np.random.rand + astype)
+        rng = np.random.default_rng(42)
+        return rng.random((100, 16), dtype=np.float32)
+
+    @pytest.fixture(scope="module")
     def sample_ids(self):
         return [f"item_{i}" for i in range(100)]
     
@@ -193,13 +207,58 @@ class TestSimilarityIndex:
         
         assert len(results) == 5
         assert results[0][0] == "item_0"  # Should find itself first
-        assert results[0][1] == 0.0  # Distance to itself is 0
-        assert results[0][2] == 1.0  # Similarity to itself is 1
+        # Self-match distance/similarity are only float32-exact if
+        # renormalizing the stored row is bit-identical, which FAISS
+        # doesn't guarantee across builds -- compare approximately
+        assert results[0][1] == pytest.approx(0.0, abs=1e-6)  # Distance to itself
+        assert results[0][2] == pytest.approx(1.0, abs=1e-6)  # Similarity to itself
         
         # Check results are sorted by distance
         distances = [r[1] for r in results]
         assert distances == sorted(distances)
     
+    @pytest.mark.parametrize('kwargs', [
+        {'index_type': 'ivf'},
+        {'quantize': 'sq8'},
+        {'quantize': 'pq'},
+    ], ids=['ivf', 'sq8', 'pq'])
+    def test_build_index_variants(self, tmp_path, sample_vectors, sample_ids, kwargs):
+        """Test that every index variant builds, searches, and reloads"""
+        index = SimilarityIndex(index_path=str(tmp_path), **kwargs)
+        index.build(sample_vectors, sample_ids)
+
+        results = index.search(sample_vectors[0], k=5)
+
+        assert len(results) == 5
+        # Quantized variants are approximate, so only assert ordering
+        distances = [r[1] for r in results]
+        assert distances == sorted(distances)
+
+        # Round-trip through disk
+        reloaded = SimilarityIndex(index_path=str(tmp_path))
+        assert len(reloaded.item_ids) == 100
+        assert len(reloaded.search(sample_vectors[0], k=5)) == 5
+
+    def test_ivf_nprobe_persisted(self, tmp_path, sample_vectors, sample_ids):
+        """Test that a reloaded IVF index searches with the same nprobe"""
+        index = SimilarityIndex(index_path=str(tmp_path), index_type='ivf')
+        index.build(sample_vectors, sample_ids)
+
+        reloaded = SimilarityIndex(index_path=str(tmp_path))
+
+        assert reloaded.index.nprobe == index.index.nprobe
+
+    def test_search_batch(self, index, sample_vectors, sample_ids):
+        """Test batched similarity search"""
+        index.build(sample_vectors, sample_ids)
+
+        batch_results = index.search_batch(sample_vectors[:3], k=5)
+
+        assert len(batch_results) == 3
+        for i, results in enumerate(batch_results):
+            assert len(results) == 5
+            assert results[0][0] == f"item_{i}"  # Each query self-matches
+
     def test_add_items(self, index, sample_vectors, sample_ids):
         """Test adding items to existing index"""
         # Build initial index with half the data